@@ -8,12 +8,14 @@ bot_run.py — Post-only bot (7 fixed times/day), RANDOM block selection.
 - Picks a **random block** each time a slot is due.
 - Uses **7 fixed ET slots per day**: 08:30, 09:30, 10:00, 13:30, 14:00, 15:15, 16:00, with a +30 min posting window.
 - State is stored in `.post_state.json` (planned slots, posted slots, simple log).
+- Block offsets are cached in `.tweets_index.json`, rebuilt whenever tweets.txt's mtime/size changes.
 - Fix: the “Next:” display shows the next **future** slot, not the first unposted one.
 """
 from __future__ import annotations
-import os, json, random, subprocess, sys
+import os, json, random, subprocess, sys, functools
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
@@ -25,23 +27,34 @@ POSTED_FILE = Path("posted_tweets.txt")
 POSTED_JSONL = Path("posted.jsonl")  # append {id, time, text} per post
 TWEETS_FILE = Path(os.getenv("TWEETS_FILE", "tweets.txt"))
 POST_STATE  = Path(os.getenv("POST_STATE_FILE", ".post_state.json"))
+TWEETS_INDEX = Path(os.getenv("TWEETS_INDEX_FILE", ".tweets_index.json"))  # block offsets cache
 SLOTS_PER_DAY = int(os.getenv("SLOTS_PER_DAY", "7"))
 START_HOUR    = int(os.getenv("START_HOUR", "6"))
 END_HOUR      = int(os.getenv("END_HOUR", "23"))
 WINDOW_MIN    = int(os.getenv("WINDOW_MIN", "40"))
+VERBOSE       = os.getenv("VERBOSE") == "1"  # also print the planned/posted slot lists
 
 # ---- Tweepy ensure & writer client ----
-def _ensure_tweepy():
-    try:
-        import tweepy  # type: ignore
-        return tweepy
-    except ModuleNotFoundError:
-        print("tweepy not found — installing...", flush=True)
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "--quiet", "tweepy>=4.14.0"])
-        import tweepy  # type: ignore
-        return tweepy
+_TWEEPY = None
 
+def _ensure_tweepy():
+    """Import tweepy once per process; pip-install it when missing only if INSTALL_MISSING_DEPS=1."""
+    global _TWEEPY
+    if _TWEEPY is None:
+        try:
+            import tweepy  # type: ignore
+        except ModuleNotFoundError:
+            if os.getenv("INSTALL_MISSING_DEPS") != "1":
+                raise ModuleNotFoundError("tweepy not installed (pip install -r requirements.txt, or set INSTALL_MISSING_DEPS=1).") from None
+            print("tweepy not found — installing...", flush=True)
+            subprocess.check_call([sys.executable, "-m", "pip", "install", "--quiet", "tweepy>=4.14.0"])
+            import tweepy  # type: ignore
+        _TWEEPY = tweepy
+    return _TWEEPY
+
+@functools.lru_cache(maxsize=1)
 def get_writer_client():
+    """Build the OAuth1 writer client once per process; retries reuse its session."""
     tweepy = _ensure_tweepy()
     ck  = os.getenv("X_API_KEY")
     cs  = os.getenv("X_API_SECRET")
@@ -52,14 +65,52 @@ def get_writer_client():
     return tweepy.Client(consumer_key=ck, consumer_secret=cs, access_token=at, access_token_secret=ats, wait_on_rate_limit=False)
 
 # ---- File IO helpers ----
-def read_lines(path: Path) -> List[str]:
+def _stat_key(st: os.stat_result) -> List[int]:
+    return [st.st_mtime_ns, st.st_size]
+
+def read_lines(path: Path) -> Tuple[List[bytes], Optional[List[int]]]:
+    """
+    Raw UTF-8 lines of `path` (decoding is left to the caller) and the file's
+    [mtime_ns, size] key. Both stats come from the descriptor the bytes were
+    read from; the key is None if the file changed during the read.
+    """
     if not path.exists():
         raise FileNotFoundError(f"{path} not found.")
-    return path.read_text(encoding="utf-8").splitlines()
+    with path.open("rb") as f:
+        before = _stat_key(os.fstat(f.fileno()))
+        data = f.read()
+        after = _stat_key(os.fstat(f.fileno()))
+    return data.splitlines(), (before if before == after else None)
 
-def write_lines(path: Path, lines: List[str]) -> None:
-    text = "\n".join(lines).rstrip() + ("\n" if lines else "")
-    path.write_text(text, encoding="utf-8")
+def atomic_write_text(path: Path, data: str | bytes) -> os.stat_result:
+    """
+    Write to a fsynced temp file beside `path`, then os.replace() it into place.
+    Keeps the target's permission bits, removes the temp file if anything fails,
+    and returns the written file's stat (the rename keeps its mtime and size).
+    """
+    payload = data.encode("utf-8") if isinstance(data, str) else data
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    try:
+        with tmp.open("wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            if path.exists():
+                os.fchmod(f.fileno(), path.stat().st_mode & 0o7777)
+            st = os.fstat(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return st
+
+def write_lines(path: Path, lines: List[bytes]) -> os.stat_result:
+    return atomic_write_text(path, b"\n".join(lines).rstrip() + (b"\n" if lines else b""))
+
+def _is_separator(line: bytes) -> bool:
+    # Exact match is the common case; only decode lines that could be a padded `---`
+    # (str.strip() also removes non-ASCII padding like NBSP or U+3000).
+    return line == b"---" or (b"---" in line and line.decode("utf-8", "replace").strip() == "---")
 
 def append_posted(raw_block: List[str], *, status: str, tweet_id: Optional[str] = None) -> None:
     """
@@ -98,46 +149,123 @@ def load_json(path: Path, default):
         return default
 
 def save_json(path: Path, data) -> None:
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    atomic_write_text(path, json.dumps(data, indent=2, ensure_ascii=False))
 
 # ---- tweets.txt blocks ----
+@dataclass
+class TweetsBuffer:
+    """The lines of tweets.txt as read by load_blocks(), shared by every block."""
+    path: Path
+    lines: List[bytes]
+    blocks: List[Dict[str, object]] = field(default_factory=list)
+    tombstones: List[Tuple[int, int]] = field(default_factory=list)
+
+def _scan_blocks(buffer: TweetsBuffer) -> None:
+    start = 0
+
+    def flush(end: int):
+        if start == end: return
+        # Decode the whole block at once rather than line by line.
+        raw = b"\n".join(buffer.lines[start:end]).decode("utf-8").split("\n")
+        normalized = " ".join(s for s in map(str.strip, raw) if s)
+        if normalized:
+            buffer.blocks.append({"text": normalized, "start": start, "end": end, "lines_ref": buffer})
+
+    for i, ln in enumerate(buffer.lines):
+        if _is_separator(ln):
+            flush(i)
+            start = i + 1
+    flush(len(buffer.lines))
+
+def _load_index(buffer: TweetsBuffer, key: List[int]) -> Optional[List[Dict[str, object]]]:
+    """Blocks from TWEETS_INDEX if it matches `key` and is well-formed, else None."""
+    try:
+        index = load_json(TWEETS_INDEX, {})
+        if not (isinstance(index, dict) and index.get("key") == key):
+            return None
+        n = len(buffer.lines)
+        blocks = [{"text": str(text), "start": int(start), "end": int(end), "lines_ref": buffer}
+                  for start, end, text in index.get("blocks", [])]
+        if not all(0 <= b["start"] < b["end"] <= n for b in blocks):
+            raise ValueError("block offsets out of range")
+        return blocks
+    except (OSError, ValueError, TypeError) as e:
+        print(f"WARN: ignoring {TWEETS_INDEX}: {e}")
+        return None
+
+def _save_index(key: List[int], entries: List[list]) -> None:
+    # Best-effort: the index is only a cache, so failing to write it must never stop a run.
+    try:
+        atomic_write_text(TWEETS_INDEX, json.dumps({"key": key, "blocks": entries}, ensure_ascii=False, separators=(",", ":")))
+    except (OSError, ValueError, TypeError) as e:
+        print(f"WARN: could not write {TWEETS_INDEX}: {e}")
+
 def load_blocks(path: Path) -> List[Dict[str, object]]:
-    lines = read_lines(path)
-    blocks: List[Dict[str, object]] = []
-    buf: List[str] = []
+    """
+    Split tweets.txt into blocks. Each block carries `start`/`end` indices into
+    the shared `lines_ref` buffer so removed blocks can be cut out of the file
+    without reading or searching it again.
 
-    def flush():
-        if not buf: return
-        normalized = " ".join(s.strip() for s in buf if s.strip())
-        if normalized:
-            blocks.append({"text": normalized, "raw": buf.copy()})
-        buf.clear()
-
-    for ln in lines:
-        if ln.strip() == "---":
-            flush()
-        else:
-            buf.append(ln)
-    flush()
-    if not blocks:
+    The offsets and normalized text are cached in TWEETS_INDEX, keyed by the
+    file's mtime and size, so an unchanged file is not re-scanned.
+    """
+    lines, key = read_lines(path)
+    buffer = TweetsBuffer(path=path, lines=lines)
+    cached = _load_index(buffer, key) if key is not None else None
+    if cached is not None:
+        buffer.blocks.extend(cached)
+    else:
+        _scan_blocks(buffer)
+        if key is not None:
+            _save_index(key, [[b["start"], b["end"], b["text"]] for b in buffer.blocks])
+    if not buffer.blocks:
         raise ValueError("No tweet blocks found in tweets.txt (use '---' separators).")
-    return blocks
-
-def delete_block(path: Path, raw_block: List[str]) -> None:
-    lines = read_lines(path)
-    n, m = len(lines), len(raw_block)
-    start_idx = -1
-    for i in range(0, n - m + 1):
-        if all(lines[i+k] == raw_block[k] for k in range(m)):
-            start_idx = i; break
-    if start_idx == -1:
-        print("Warning: block not found; nothing deleted."); return
-    del_start, del_end = start_idx, start_idx + m
-    if del_start - 1 >= 0 and lines[del_start - 1].strip() == "---":
-        del_start -= 1
-    elif del_end < len(lines) and lines[del_end].strip() == "---":
-        del_end += 1
-    write_lines(path, lines[:del_start] + lines[del_end:])
+    return buffer.blocks
+
+def _block_raw(block: Dict[str, object]) -> List[str]:
+    """The block's original lines, decoded on demand (only posted/duplicate blocks need them)."""
+    buffer: TweetsBuffer = block["lines_ref"]  # type: ignore[assignment]
+    return b"\n".join(buffer.lines[int(block["start"]):int(block["end"])]).decode("utf-8").split("\n")
+
+def _mark_block_deleted(block: Dict[str, object]) -> None:
+    """Tombstone `block`; it is dropped from tweets.txt by the next flush_tweets_file()."""
+    buffer: TweetsBuffer = block["lines_ref"]  # type: ignore[assignment]
+    block["deleted"] = True
+    buffer.tombstones.append((int(block["start"]), int(block["end"])))
+
+def flush_tweets_file(path: Path, lines: List[bytes], tombstones: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """
+    Rewrite `path` once without the tombstoned line ranges. Ranges are applied in
+    deletion order, each taking one adjacent `---` with it (preceding first), the
+    same as deleting the blocks from the file one at a time.
+
+    Returns (new_pos, key): new_pos[i] is where old line i now starts in the
+    rewritten file, and key is the rewritten file's [mtime_ns, size].
+    """
+    n = len(lines)
+    dead = bytearray(n)
+    for start, end in tombstones:
+        dead[start:end] = b"\x01" * (end - start)
+        prev = start - 1
+        while prev >= 0 and dead[prev]: prev -= 1
+        nxt = end
+        while nxt < n and dead[nxt]: nxt += 1
+        if prev >= 0 and _is_separator(lines[prev]):
+            dead[prev] = 1
+        elif nxt < n and _is_separator(lines[nxt]):
+            dead[nxt] = 1
+    kept: List[bytes] = []
+    new_pos = [0] * (n + 1)
+    for i, ln in enumerate(lines):
+        new_pos[i] = len(kept)
+        if not dead[i]:
+            kept.append(ln)
+    new_pos[n] = len(kept)
+    # write_lines() rstrips the file, so trailing blank lines are not written.
+    while kept and not kept[-1].strip():
+        kept.pop()
+    new_pos = [min(p, len(kept)) for p in new_pos]
+    return new_pos, _stat_key(write_lines(path, kept))
 
 # ---- State helpers (PERSISTENT daily plan) ----
 def today_et() -> str:
@@ -149,29 +277,37 @@ def load_state() -> dict:
     return {}
 
 def save_state(state: dict) -> None:
-    POST_STATE.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    """Write the state file compactly (it is bot-owned, not hand-edited). save_json() stays indented."""
+    atomic_write_text(POST_STATE, json.dumps(state, separators=(",", ":")))
+
+def peek_plan(state: dict) -> bool:
+    """True if `state` already holds a non-empty plan for today. Pure check, no I/O."""
+    return state.get("date") == today_et() and bool(state.get("planned"))
+
+def ensure_plan_writing(state: dict) -> dict:
+    """Start today's plan (keeping the log) and persist it."""
+    state = {
+        "date": today_et(),
+        "planned": plan_slots_for_today(),  # uses START_HOUR/END_HOUR/SLOTS_PER_DAY
+        "posted": [],
+        "log": state.get("log", []),
+    }
+    save_state(state)
+    print(f"Planned (7/day fixed): {state['planned']} | Posted: {state['posted']}")
+    return state
 
 def ensure_plan(state: dict | None = None) -> dict:
-    state = state or load_state()
-    t = today_et()
-    planned = state.get("planned") or []
-    if state.get("date") != t or not planned:
-        state = {
-            "date": t,
-            "planned": plan_slots_for_today(),  # uses START_HOUR/END_HOUR/SLOTS_PER_DAY
-            "posted": [],
-            "log": state.get("log", []),
-        }
-        save_state(state)
-        print(f"Planned (7/day fixed): {state['planned']} | Posted: {state['posted']}")
-    else:
+    if state is None:
+        state = load_state()
+    if not peek_plan(state):
+        return ensure_plan_writing(state)
+    if VERBOSE:
         print(f"Using existing plan: {state['planned']} | Posted: {state['posted']}")
     return state
 
 # ---- Planning ----
-def _rand_minute_between(start: datetime, end: datetime) -> datetime:
-    delta_min = max(1, int((end - start).total_seconds() // 60))
-    return start + timedelta(minutes=random.randrange(delta_min))
+# Fixed ET posting times used for every day's plan.
+FIXED_SLOTS = ("08:30", "09:30", "10:00", "13:30", "14:00", "15:15", "16:00")
 
 def plan_slots_for_today(min_gap_minutes: int = 30) -> List[str]:
     """
@@ -180,37 +316,38 @@ def plan_slots_for_today(min_gap_minutes: int = 30) -> List[str]:
     All times are America/New_York (ET). Fixed schedule:
       08:30, 09:30, 10:00, 13:30, 14:00, 15:15, 16:00
     """
-    return [
-        "08:30",
-        "09:30",
-        "10:00",
-        "13:30",
-        "14:00",
-        "15:15",
-        "16:00",
-    ]
-    return sorted(dt.strftime("%H:%M") for dt in picks)
+    return list(FIXED_SLOTS)
+
+def _parse_slots(state: dict) -> List[Tuple[str, datetime]]:
+    """(slot, aware ET datetime) for every planned "HH:MM" slot on state["date"]."""
+    y, m, d = (int(p) for p in state["date"].split("-"))
+    return [(slot, datetime(y, m, d, int(slot[:2]), int(slot[3:]), tzinfo=ET))
+            for slot in state.get("planned", [])]
 
 def find_due_slot(state: dict) -> Optional[str]:
     now = now_et()
-    for slot in state.get("planned", []):
-        if slot in state.get("posted", []): continue
-        slot_dt = datetime.fromisoformat(state["date"] + f" {slot}:00").replace(tzinfo=ET)
-        if slot_dt <= now <= slot_dt + timedelta(minutes=WINDOW_MIN):
+    window = timedelta(minutes=WINDOW_MIN)
+    posted_set = frozenset(state.get("posted", ()))
+    for slot, slot_dt in _parse_slots(state):
+        if slot in posted_set: continue
+        if slot_dt <= now <= slot_dt + window:
             return slot
     return None
 
 def next_future_slot(state: dict) -> Optional[str]:
     """Earliest unposted slot that is still in the future (fix for naive 'Next:')."""
     now = now_et()
-    def to_dt(s: str):
-        return datetime.fromisoformat(state["date"] + f" {s}:00").replace(tzinfo=ET)
-    future = [s for s in state.get("planned", []) if s not in state.get("posted", []) and to_dt(s) > now]
-    return min(future, key=to_dt) if future else None
+    posted_set = frozenset(state.get("posted", ()))
+    best: Optional[Tuple[str, datetime]] = None
+    for slot, slot_dt in _parse_slots(state):
+        if slot in posted_set or slot_dt <= now: continue
+        if best is None or slot_dt < best[1]:
+            best = (slot, slot_dt)
+    return best[0] if best else None
 
 # ---- Posting ----
 def post_to_x(text: str) -> Optional[str]:
-    import tweepy
+    tweepy = _ensure_tweepy()
     client = get_writer_client()
     try:
         resp = client.create_tweet(text=text)
@@ -236,50 +373,62 @@ def post_random_block(state: dict, blocks: List[Dict[str, object]]) -> Optional[
     if not blocks:
         return None
 
-    while blocks:
-        idx = random.randrange(len(blocks))
-        blk = blocks[idx]
-        text = str(blk["text"])
-        raw = list(blk["raw"])
-
-        print(f"Trying RANDOM block #{idx+1}/{len(blocks)}: {text[:120]}{'…' if len(text)>120 else ''}")
-        res = post_to_x(text)
-
-        # DUPLICATE → log to posted_tweets.txt, remove from source, keep looping
-        if res == "DUPLICATE":
-            append_posted(raw, status="DUPLICATE")
-            delete_block(TWEETS_FILE, raw)
-            del blocks[idx]
-            continue
-
-        # SUCCESS → log to posted_tweets.txt + posted.jsonl with tweet id, remove from source, record in state, exit
-        if isinstance(res, str) and res.isdigit():
-            append_posted(raw, status="POSTED", tweet_id=res)
-            delete_block(TWEETS_FILE, raw)
-            del blocks[idx]
-            state.setdefault("log", []).append({"time": now_et().isoformat(), "text": text, "id": res})
-            save_state(state)
-            print(f'Posted: "{text}"')  # echo exact content that was posted
-            return res
-
-        # Any other failure → stop (don’t burn through content)
-        return None
+    buffer: TweetsBuffer = blocks[0]["lines_ref"]  # type: ignore[assignment]
+    live = list(range(len(blocks)))  # untried indices; swap-remove keeps each pick O(1)
+    try:
+        while live:
+            j = random.randrange(len(live))
+            idx = live[j]
+            live[j] = live[-1]
+            live.pop()
+            blk = blocks[idx]
+            text = str(blk["text"])
+            raw = _block_raw(blk)
+
+            print(f"Trying RANDOM block #{idx+1}/{len(blocks)}: {text[:120]}{'…' if len(text)>120 else ''}")
+            res = post_to_x(text)
+
+            # DUPLICATE → log to posted_tweets.txt, remove from source, keep looping
+            if res == "DUPLICATE":
+                append_posted(raw, status="DUPLICATE")
+                _mark_block_deleted(blk)
+                continue
+
+            # SUCCESS → log to posted_tweets.txt + posted.jsonl with tweet id, remove from source, record in state, exit
+            if isinstance(res, str) and res.isdigit():
+                append_posted(raw, status="POSTED", tweet_id=res)
+                _mark_block_deleted(blk)
+                state.setdefault("log", []).append({"time": now_et().isoformat(), "text": text, "id": res})
+                save_state(state)
+                print(f'Posted: "{text}"')  # echo exact content that was posted
+                return res
+
+            # Any other failure → stop (don’t burn through content)
+            return None
 
-    return None
+        return None
+    finally:
+        # One rewrite of tweets.txt for every block removed this run.
+        if buffer.tombstones:
+            new_pos, key = flush_tweets_file(buffer.path, buffer.lines, buffer.tombstones)
+            blocks[:] = [b for b in blocks if not b.get("deleted")]
+            # The rewrite changed tweets.txt's key; re-point the index at the new file.
+            _save_index(key, [[new_pos[int(b["start"])], new_pos[int(b["end"])], b["text"]] for b in blocks])
 
 # ---- Main ----
 def main():
     random.seed()
-    blocks = load_blocks(TWEETS_FILE)
     state = ensure_plan(load_state())
 
     due = find_due_slot(state)
     if not due:
         upcoming = next_future_slot(state)
-        print(f"No slot due. Next: {upcoming or 'none today'}. Planned: {state['planned']} | Posted: {state['posted']}")
+        print(f"No slot due. Next: {upcoming or 'none today'}."
+              + (f" Planned: {state['planned']} | Posted: {state['posted']}" if VERBOSE else ""))
         return
 
     print(f"Slot {due} is due (window +{WINDOW_MIN}m). Posting…")
+    blocks = load_blocks(TWEETS_FILE)  # only read tweets.txt when something will be posted
     tweet_id = post_random_block(state, blocks)
     if tweet_id:
         state["posted"].append(due); save_state(state); print(f"Posted OK: {tweet_id}")
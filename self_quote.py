@@ -13,14 +13,21 @@ Requires env secrets: X_API_KEY, X_API_SECRET, X_ACCESS_TOKEN, X_ACCESS_SECRET
 
 from __future__ import annotations
 import os, json, random
+from collections import deque
 from pathlib import Path
+from typing import Iterable, Iterator
 from zoneinfo import ZoneInfo
 from datetime import datetime
-from dateutil.parser import parse as parse_dt
 import tweepy
 
+try:
+    from orjson import loads as _loads  # optional, faster on large logs
+except ImportError:
+    _loads = json.loads
+
 POSTED_JSONL = Path("posted.jsonl")
 ET = ZoneInfo("America/New_York")
+_ET_ABBREVS = {"EST", "EDT", "ET"}
 
 SKIP_RECENT = int(os.getenv("SELFQUOTE_SKIP_RECENT", "8"))
 MIN_AGE_HOURS = int(os.getenv("SELFQUOTE_MIN_AGE_HOURS", "36"))
@@ -47,60 +54,93 @@ def get_writer_client() -> tweepy.Client:
         bearer_token=os.getenv("X_BEARER_TOKEN"),  # optional
     )
 
-def read_posted_jsonl() -> list[dict]:
+def iter_older_rows(skip: int = SKIP_RECENT) -> Iterator[dict]:
+    """
+    Stream posted.jsonl and yield parsed rows, oldest first, excluding the `skip`
+    most recent rows. Those tail rows are only buffered as bytes, never parsed.
+
+    Only lines shaped like a complete JSON object ('{...}') count towards the
+    tail, so blank or truncated lines don't push real recent posts out of it.
+    A line that passes that check but still fails to parse does count.
+    """
     if not POSTED_JSONL.exists():
-        return []
-    rows: list[dict] = []
-    for line in POSTED_JSONL.read_text(encoding="utf-8").splitlines():
-        if not line.strip():
-            continue
-        try:
-            rows.append(json.loads(line))
-        except Exception:
-            pass
-    return rows
+        return
+    tail: deque[bytes] = deque()
+    with POSTED_JSONL.open("rb") as jf:
+        for line in jf:
+            line = line.strip()
+            if not (line.startswith(b"{") and line.endswith(b"}")):
+                continue
+            tail.append(line)
+            if len(tail) <= skip:
+                continue
+            try:
+                yield _loads(tail.popleft())
+            except Exception:
+                pass
 
-def write_posted_jsonl(rows: list[dict]) -> None:
-    """Rewrite posted.jsonl atomically with the given rows."""
+def remove_posted_id(tid: str) -> int:
+    """Rewrite posted.jsonl atomically without the rows for `tid`; return how many rows remain."""
     tmp = POSTED_JSONL.with_suffix(".tmp")
-    with tmp.open("w", encoding="utf-8") as jf:
-        for r in rows:
-            jf.write(json.dumps(r, ensure_ascii=False) + "\n")
+    needle = tid.encode()
+    kept = 0
+    with POSTED_JSONL.open("rb") as src, tmp.open("wb") as dst:
+        for line in src:
+            if not line.strip():
+                continue
+            # Only lines that mention the id can match, so only those get parsed.
+            if needle in line:
+                try:
+                    if str(_loads(line).get("id", "")) == tid:
+                        continue
+                except Exception:
+                    pass
+            dst.write(line if line.endswith(b"\n") else line + b"\n")
+            kept += 1
     tmp.replace(POSTED_JSONL)
+    return kept
+
+def _parse_et(et_str: str) -> datetime:
+    """
+    Parse an `et` stamp. bot_run writes 'YYYY-MM-DD HH:MM:SS EST|EDT', which
+    fromisoformat handles once the zone abbreviation is dropped. Raises
+    ValueError on anything else.
+
+    The abbreviation picks the side of the fall-back hour: 'EST' is the
+    second 01:xx (fold=1), 'EDT' the first.
+    """
+    head, _, abbrev = et_str.rpartition(" ")
+    dt = datetime.fromisoformat(head if abbrev in _ET_ABBREVS else et_str)
+    return dt if dt.tzinfo else dt.replace(tzinfo=ET, fold=1 if abbrev == "EST" else 0)
 
-def eligible_pool(rows: list[dict]) -> list[dict]:
-    """Return rows excluding the most recent N and filtering by min age if available."""
-    if len(rows) <= SKIP_RECENT:
-        return []
-    older = rows[:-SKIP_RECENT]
+def eligible_pool(rows: Iterable[dict]) -> list[str]:
+    """Return tweet ids from `rows` (already past the most recent N) that pass the min-age filter."""
     if MIN_AGE_HOURS <= 0:
-        return [r for r in older if str(r.get("id", "")).isdigit()]
+        return [tid for tid in (str(r.get("id", "")) for r in rows) if tid.isdigit()]
     cutoff = datetime.now(ET).timestamp() - (MIN_AGE_HOURS * 3600)
-    pool: list[dict] = []
-    for r in older:
+    pool: list[str] = []
+    for r in rows:
         tid = str(r.get("id", ""))
         if not tid.isdigit():
             continue
         et_str = r.get("et", "")
         try:
-            ts = parse_dt(et_str).timestamp()
+            ts = _parse_et(et_str).timestamp()
         except Exception:
             # if we can't parse, still allow it (it's old because it's not in the last N)
-            pool.append(r)
+            pool.append(tid)
             continue
         if ts <= cutoff:
-            pool.append(r)
+            pool.append(tid)
     return pool
 
 def main() -> int:
-    rows = read_posted_jsonl()
-    pool = eligible_pool(rows)
+    pool = eligible_pool(iter_older_rows())
     if not pool:
         print("Self-quote: not enough eligible history yet.")
         return 0
 
-    pick = random.choice(pool)
-    tid = str(pick["id"])
+    tid = random.choice(pool)
     intro = random.choice(INTRO)
 
     client = get_writer_client()
@@ -108,9 +148,8 @@ def main() -> int:
     print(f"Quoted id: {tid} -> {getattr(resp, 'data', {})}")
 
     # Remove the quoted item from posted.jsonl
-    new_rows = [r for r in rows if str(r.get("id", "")) != tid]
-    write_posted_jsonl(new_rows)
-    print(f"Removed quoted id {tid} from posted.jsonl (remaining: {len(new_rows)})")
+    remaining = remove_posted_id(tid)
+    print(f"Removed quoted id {tid} from posted.jsonl (remaining: {remaining})")
     return 0
 
 
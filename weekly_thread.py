@@ -15,7 +15,7 @@ Env (optional):
 """
 
 from __future__ import annotations
-import os, json
+import os, json, re
 from pathlib import Path
 from typing import List
 import tweepy
@@ -24,6 +24,9 @@ THREADS_FILE = Path(os.getenv("THREADS_FILE", "threads.txt"))
 STATE_FILE   = Path(os.getenv("THREAD_STATE_FILE", ".thread_state.json"))
 MAX_TWEETS   = int(os.getenv("THREAD_MAX_TWEETS", "5"))
 
+# A line holding only '---' (surrounding spaces/tabs allowed) separates blocks.
+_SEP = re.compile(r"(?m)^[ \t]*---[ \t]*$")
+
 def get_writer_client() -> tweepy.Client:
     ck  = os.getenv("X_API_KEY")
     cs  = os.getenv("X_API_SECRET")
@@ -44,11 +47,10 @@ def load_blocks(path: Path) -> List[List[str]]:
         raise FileNotFoundError(f"{path} not found.")
     raw = path.read_text(encoding="utf-8")
     blocks: List[List[str]] = []
-    for chunk in raw.split("\n---\n"):
-        lines = [ln.strip() for ln in chunk.splitlines() if ln.strip()]
+    for chunk in _SEP.split(raw):
+        # strip once per line, enforce 280 and cap per-thread tweet count
+        lines = [s[:280] for s in (ln.strip() for ln in chunk.splitlines()) if s][:MAX_TWEETS]
         if lines:
-            # enforce 280 and cap per-thread tweet count
-            lines = [ln[:280] for ln in lines][:MAX_TWEETS]
             blocks.append(lines)
     if not blocks:
         raise ValueError("No thread blocks found (use '---' separators).")